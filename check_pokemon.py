@@ -1,21 +1,62 @@
-import requests
+import functools
+import json
+import os
 import re
 
+from http_utils import polite_get
+
+OUTPUT_DIR = "output"
+if not os.path.exists(OUTPUT_DIR):
+    os.makedirs(OUTPUT_DIR)
+
+ID_CACHE_FILE = os.path.join(OUTPUT_DIR, "pokemon_id_cache.json")
+
+# Format: https://prices.pokemontcg.io/tcgplayer/42382
+TCG_ID_RE = re.compile(r"tcgplayer/(\d+)")
+
+def load_cache():
+    if os.path.exists(ID_CACHE_FILE):
+        with open(ID_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    return {}
+
+def save_cache(cache):
+    with open(ID_CACHE_FILE, 'w') as f:
+        json.dump(cache, f)
+
+# Persistent query -> TCGPlayer ID map, loaded once at import
+ID_CACHE = load_cache()
+
+@functools.lru_cache(maxsize=4096)
 def get_pokemon_tcg_id(card_name, set_id=None):
     """
     Searches for a Pokemon card and extracts the TCGPlayer ID.
+    Results are memoized in-process and persisted to ID_CACHE_FILE.
     """
+    query = f"name:\"{card_name}\""
+    if set_id:
+        query += f" set.id:{set_id}"
+    
+    if query in ID_CACHE:
+        return ID_CACHE[query]
+    
+    tcg_id = fetch_pokemon_tcg_id(query)
+    if tcg_id:
+        ID_CACHE[query] = tcg_id
+        save_cache(ID_CACHE)
+    return tcg_id
+
+def fetch_pokemon_tcg_id(query):
+    """Queries the Pokemon TCG API and extracts the TCGPlayer ID of the first match."""
     api_url = "https://api.pokemontcg.io/v2/cards"
     headers = {"X-Api-Key": ""} # Optional: Add API key if rate limited
     
-    params = {"q": f"name:\"{card_name}\""}
-    if set_id:
-        params["q"] += f" set.id:{set_id}"
+    params = {"q": query}
         
     print(f"Searching for: {params['q']}...")
     
     try:
-        response = requests.get(api_url, params=params, headers=headers)
+        response = polite_get(api_url, params=params, headers=headers)
         data = response.json()
         
         if "data" in data and len(data["data"]) > 0:
@@ -30,7 +71,7 @@ def get_pokemon_tcg_id(card_name, set_id=None):
                 # Extract ID from URL
                 # Format: https://prices.pokemontcg.io/tcgplayer/42382
                 if url:
-                    match = re.search(r"tcgplayer/(\d+)", url)
+                    match = TCG_ID_RE.search(url)
                     if match:
                         return match.group(1)
             else:
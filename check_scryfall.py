@@ -1,8 +1,34 @@
 import csv
-import requests
-import time
+from concurrent.futures import ThreadPoolExecutor
+
+from http_utils import polite_get
 
 CSV_FILE = 'spm_for_store.csv'
+# Max in-flight requests; keeps us well under Scryfall's 10 req/s guideline
+MAX_CONCURRENCY = 5
+
+def fetch_card(card):
+    """Looks up a single card on Scryfall and returns the lines to print."""
+    scryfall_id = card['Scryfall ID']
+    name = card['Name']
+    
+    if not scryfall_id:
+        return [f"Skipping {name} (No Scryfall ID)"]
+        
+    url = f"https://api.scryfall.com/cards/{scryfall_id}"
+    try:
+        response = polite_get(url)
+        if response.status_code == 200:
+            data = response.json()
+            tcg_id = data.get('tcgplayer_id')
+            return [
+                f"Card: {name}",
+                f"  Scryfall ID: {scryfall_id}",
+                f"  TCGPlayer ID: {tcg_id}",
+            ]
+        return [f"Error fetching {name}: {response.status_code}"]
+    except Exception as e:
+        return [f"Exception: {e}"]
 
 def check_scryfall_ids():
     with open(CSV_FILE, 'r', encoding='utf-8') as f:
@@ -11,30 +37,12 @@ def check_scryfall_ids():
         
     print(f"Checking first 5 cards from {len(cards)} total...")
     
-    for i, card in enumerate(cards[:5]):
-        scryfall_id = card['Scryfall ID']
-        name = card['Name']
-        
-        if not scryfall_id:
-            print(f"Skipping {name} (No Scryfall ID)")
-            continue
-            
-        url = f"https://api.scryfall.com/cards/{scryfall_id}"
-        try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                data = response.json()
-                tcg_id = data.get('tcgplayer_id')
-                print(f"Card: {name}")
-                print(f"  Scryfall ID: {scryfall_id}")
-                print(f"  TCGPlayer ID: {tcg_id}")
-            else:
-                print(f"Error fetching {name}: {response.status_code}")
-        except Exception as e:
-            print(f"Exception: {e}")
-            
-        # Be nice to Scryfall API
-        time.sleep(0.1)
+    # Be nice to Scryfall API: politeness comes from the concurrency cap
+    # instead of a fixed sleep between serial requests.
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as pool:
+        for lines in pool.map(fetch_card, cards[:5]):
+            for line in lines:
+                print(line)
 
 if __name__ == "__main__":
     check_scryfall_ids()
@@ -1,11 +1,12 @@
 import csv
-import time
 import logging
 import datetime
 import re
 import os
 from playwright.sync_api import sync_playwright
 
+from page_utils import click_search, wait_for_next_page
+
 # Configuration
 OUTPUT_DIR = "output"
 if not os.path.exists(OUTPUT_DIR):
@@ -13,6 +14,35 @@ if not os.path.exists(OUTPUT_DIR):
 
 OUTPUT_CSV = os.path.join(OUTPUT_DIR, f"tcg_inventory_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
 
+# Scrapes the whole results table in one evaluate; kept constant so the
+# identical source is reused on every page
+SCRAPE_JS = r"""() => {
+    const rows = Array.from(document.querySelectorAll("table tbody tr"));
+    return rows.map(row => {
+        const cells = Array.from(row.querySelectorAll("td"));
+        if (cells.length < 5) return null;
+        
+        // Try to find Product ID from the 'Manage' link or checkbox
+        let pid = "";
+        const manageLink = row.querySelector("a[href*='/admin/product/manage/']");
+        if (manageLink) {
+            const match = manageLink.getAttribute('href').match(/manage\/(\d+)/);
+            if (match) pid = match[1];
+        }
+        
+        // Name is usually in the 2nd column (index 1), often inside a link or strong tag
+        const name = cells[1] ? cells[1].innerText.trim() : "Unknown";
+        const set = cells[2] ? cells[2].innerText.trim() : "Unknown";
+        
+        return {
+            'Product ID': pid,
+            'Name': name,
+            'Set': set,
+            'Raw Data': row.innerText.replace(/\t/g, ' ').replace(/\n/g, ' | ')
+        };
+    }).filter(item => item !== null && item['Product ID'] !== "");
+}"""
+
 def main():
     print("Starting Inventory Downloader...")
     print("IMPORTANT: Ensure Chrome is running with --remote-debugging-port=9222")
@@ -43,9 +73,8 @@ def main():
             
             search_btn = page.get_by_role("button", name="Search", exact=True)
             if search_btn.is_visible():
-                search_btn.click()
+                click_search(page, search_btn)
                 print("  Clicked Search")
-                page.wait_for_selector("table tbody tr", timeout=10000)
         except Exception as e:
             print(f"  Error setting filters: {e}")
 
@@ -61,6 +90,7 @@ def main():
         # 2. Scrape Loop
         all_products = []
         page_num = 1
+        last_page_key = None
         
         while True:
             print(f"Scraping Page {page_num}...")
@@ -73,32 +103,14 @@ def main():
                 break
             
             # Use evaluate to scrape the whole table at once (MUCH faster/robust)
-            page_data = page.evaluate(r"""() => {
-                const rows = Array.from(document.querySelectorAll("table tbody tr"));
-                return rows.map(row => {
-                    const cells = Array.from(row.querySelectorAll("td"));
-                    if (cells.length < 5) return null;
-                    
-                    // Try to find Product ID from the 'Manage' link or checkbox
-                    let pid = "";
-                    const manageLink = row.querySelector("a[href*='/admin/product/manage/']");
-                    if (manageLink) {
-                        const match = manageLink.getAttribute('href').match(/manage\/(\d+)/);
-                        if (match) pid = match[1];
-                    }
-                    
-                    // Name is usually in the 2nd column (index 1), often inside a link or strong tag
-                    const name = cells[1] ? cells[1].innerText.trim() : "Unknown";
-                    const set = cells[2] ? cells[2].innerText.trim() : "Unknown";
-                    
-                    return {
-                        'Product ID': pid,
-                        'Name': name,
-                        'Set': set,
-                        'Raw Data': row.innerText.replace(/\t/g, ' ').replace(/\n/g, ' | ')
-                    };
-                }).filter(item => item !== null && item['Product ID'] !== "");
-            }""")
+            page_data = page.evaluate(SCRAPE_JS)
+            
+            # If pagination didn't advance we'd just scrape the same rows again
+            page_key = tuple(item['Product ID'] for item in page_data)
+            if page_key and page_key == last_page_key:
+                print("  Page unchanged after clicking Next. Ending.")
+                break
+            last_page_key = page_key
             
             print(f"  Found {len(page_data)} items.")
             all_products.extend(page_data)
@@ -109,9 +121,10 @@ def main():
             try:
                 next_btn = page.get_by_role("link", name="Next", exact=True)
                 if next_btn.is_visible() and "disabled" not in next_btn.get_attribute("class", ""):
+                    prev_pid = page_data[0]['Product ID'] if page_data else ""
                     next_btn.click()
                     page_num += 1
-                    time.sleep(2) # Wait for load
+                    wait_for_next_page(page, prev_pid)
                 else:
                     print("  End of catalog.")
                     break
@@ -0,0 +1,79 @@
+import os
+import random
+import requests
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+OUTPUT_DIR = "output"
+if not os.path.exists(OUTPUT_DIR):
+    os.makedirs(OUTPUT_DIR)
+
+HTTP_CACHE_FILE = os.path.join(OUTPUT_DIR, "http_cache.sqlite")
+
+# Minimum gap between any two Scryfall request starts (Scryfall asks for <= 10 requests/second)
+SCRYFALL_MIN_INTERVAL = 0.1
+
+# Rate limiting: extra attempts after a 429, and the X-RateLimit-Remaining
+# level below which we start slowing down
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_LOW_WATER = 10
+
+# Session behind polite_get: one pooled keep-alive connection per host.
+# Responses are cached on disk; repeat runs revalidate with If-None-Match /
+# If-Modified-Since and reuse the stored body on a 304.
+try:
+    from requests_cache import CachedSession
+    SESSION = CachedSession(HTTP_CACHE_FILE, cache_control=True, expire_after=3600)
+except ImportError:
+    SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[500, 502, 503, 504], # 429 is left to polite_get
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+))
+
+slot_lock = threading.Lock()
+last_request_start = 0.0
+
+def acquire_slot():
+    """Blocks until SCRYFALL_MIN_INTERVAL has passed since the last request started, across all threads."""
+    global last_request_start
+    with slot_lock:
+        wait = last_request_start + SCRYFALL_MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        last_request_start = time.monotonic()
+
+def parse_retry_after(value, default=5.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default # Missing, or an HTTP-date we don't bother parsing
+
+def polite_get(url, **kwargs):
+    """
+    GET through the shared session. Backs off (with jitter) on 429 and
+    paces itself when X-RateLimit-Remaining runs low.
+    """
+    for attempt in range(RATE_LIMIT_RETRIES):
+        response = SESSION.get(url, timeout=10, **kwargs)
+        if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES - 1:
+            break
+        wait = parse_retry_after(response.headers.get("Retry-After")) + random.uniform(0, 1)
+        print(f"  Rate limited, retrying in {wait:.1f}s...")
+        time.sleep(wait)
+
+    # Cache hits never touched the API, so there is nothing to pace
+    if not getattr(response, "from_cache", False):
+        remaining = response.headers.get("X-RateLimit-Remaining", "")
+        if remaining.isdigit() and int(remaining) < RATE_LIMIT_LOW_WATER:
+            time.sleep((RATE_LIMIT_LOW_WATER - int(remaining)) * 0.1 + random.uniform(0, 0.1))
+    return response
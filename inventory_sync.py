@@ -1,13 +1,27 @@
+import atexit
 import csv
 import time
 import logging
 import datetime
+import functools
 import re
 import argparse
 import json
 import os
+import queue
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from playwright.sync_api import sync_playwright
 
+from page_utils import click_search, wait_for_next_page
+
+# orjson is much faster on large harvest files; stdlib json works too
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Configuration
 OUTPUT_DIR = "output"
 if not os.path.exists(OUTPUT_DIR):
@@ -16,6 +30,16 @@ if not os.path.exists(OUTPUT_DIR):
 HARVEST_FILE = os.path.join(OUTPUT_DIR, "harvest_latest.json")
 PROGRESS_FILE = os.path.join(OUTPUT_DIR, "progress_latest.json")
 
+# Products between progress checkpoints
+PROGRESS_EVERY = 25
+
+# Resource types the manage pages don't need for scraping/price matching.
+# Scripts, XHR and documents stay enabled - the Knockout bindings need them -
+# and so do stylesheets, which the visibility checks depend on.
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+
+REPORT_FIELDS = ('Product ID', 'Name', 'Set', 'Category', 'Number', 'Rarity', 'Variant', 'Qty', 'Old Price', 'New Price', 'Status')
+
 # Setup Logging
 logging.basicConfig(
     level=logging.INFO,
@@ -23,10 +47,337 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 
+# Strips currency formatting, e.g. "$1,234.50" -> "1234.50"
+PRICE_STRIP = str.maketrans('', '', '$,')
+
+@functools.lru_cache(maxsize=65536)
+def parse_price(price_text):
+    """Parses a displayed price string to float (raises ValueError for e.g. 'N/A')."""
+    return float(price_text.translate(PRICE_STRIP))
+
+def load_harvest():
+    if orjson:
+        with open(HARVEST_FILE, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(HARVEST_FILE, 'r') as f:
+        return json.load(f)
+
+def save_harvest(product_ids):
+    if orjson:
+        with open(HARVEST_FILE, 'wb') as f:
+            f.write(orjson.dumps(product_ids))
+        return
+    with open(HARVEST_FILE, 'w') as f:
+        json.dump(product_ids, f)
+
+def block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.continue_()
+
+def match_market_price(page, row_idx):
+    """Clicks the Market Price 'Match' button on a variant row and returns the new price."""
+    row = page.locator("table tbody tr").nth(row_idx)
+    market_btn = row.locator("input[value='Match']").nth(2) # 0-indexed, so 3rd button
+    price_input = row.locator("input[data-bind*='textInput: newPrice']").first
+    market_btn.click()
+    if price_input.is_visible():
+        return price_input.input_value()
+    return "N/A"
+
+def process_product(page, item, index, total, dry_run):
+    """
+    Visits a product's manage page, matches Market Price on every in-stock
+    variant (unless dry_run) and returns the report rows for it.
+    Returns None if the product was skipped.
+    """
+    # Handle both old format (string) and new format (dict) for backward compatibility
+    if isinstance(item, dict):
+        pid = item['id']
+        catalog_set = item.get('set', '')
+        catalog_cat = item.get('category', '')
+        catalog_rarity = item.get('rarity', '')
+        catalog_number = item.get('number', '')
+    else:
+        pid = item
+        catalog_set = ""
+        catalog_cat = ""
+        catalog_rarity = ""
+        catalog_number = ""
+
+    print(f"[{index}/{total}] Processing ID: {pid}")
+
+    url = f"https://store.tcgplayer.com/admin/product/manage/{pid}"
+
+    # Retry Logic
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            page.goto(url, timeout=45000)
+            break
+        except Exception as e:
+            print(f"  Navigation failed (Attempt {attempt+1}/{max_retries}): {e}")
+            time.sleep(5)
+    else:
+        print("  Skipping this card due to repeated timeouts.")
+        return None
+
+    try:
+        page.wait_for_load_state('domcontentloaded', timeout=10000)
+    except:
+        pass
+
+    # Check for table
+    try:
+        if not page.locator("table").first.is_visible():
+            print("  No table found on page. Skipping.")
+            return None
+    except:
+        pass
+
+    product_name = "Unknown"
+    try:
+        # Strategy 1: Knockout data-bind (Most reliable)
+        span = page.locator("span[data-bind='text: productName']").first
+        if span.is_visible():
+            product_name = span.text_content().strip()
+
+        # Strategy 2: Link Title
+        if not product_name or product_name == "Unknown":
+            link = page.locator("a.blue-button-sm").first
+            if link.is_visible():
+                title_attr = link.get_attribute("title")
+                if title_attr:
+                    product_name = title_attr.replace("View all live prices for ", "").replace(" in a new tab!", "").strip()
+
+        # Strategy 3: H1 (Fallback)
+        if not product_name or product_name == "Unknown":
+            h1 = page.locator("h1").first
+            if h1.is_visible():
+                text = h1.text_content().strip()
+                if text and "Seller Portal" not in text:
+                    product_name = text
+
+        # Strategy 4: Page Title (Last Resort)
+        if not product_name or product_name == "Unknown":
+            title = page.title()
+            if "-" in title:
+                product_name = title.split("-")[1].strip()
+            elif "Seller Portal" not in title:
+                product_name = title
+
+        # Use Catalog Data for Set/Category/Rarity/Number
+        set_name = catalog_set
+        category = catalog_cat
+        rarity = catalog_rarity
+        number = catalog_number
+
+        # Fallback Extraction if Catalog Data is missing
+        if not set_name:
+            try:
+                set_label = page.locator(".pInfo label", has_text="Set Name").first
+                if set_label.is_visible():
+                    full_text = set_label.locator("..").text_content().strip()
+                    set_name = full_text.replace("Set Name", "").strip()
+            except: pass
+
+        if not category:
+            try:
+                link = page.locator("a.blue-button-sm").first
+                if link.is_visible():
+                    href = link.get_attribute("href")
+                    if href and "/product/" in href:
+                        parts = href.split(f"/product/{pid}/")
+                        if len(parts) > 1:
+                            slug = parts[1]
+                            if slug.startswith("magic"): category = "Magic: The Gathering"
+                            elif slug.startswith("pokemon"): category = "Pokemon"
+                            elif slug.startswith("yugioh"): category = "Yu-Gi-Oh!"
+                            elif slug.startswith("lorcana"): category = "Lorcana"
+                            elif slug.startswith("star-wars"): category = "Star Wars"
+                            else: category = slug.split("-")[0].capitalize()
+            except: pass
+
+        print(f"  Product: {product_name} | Set: {set_name} | Cat: {category} | #: {number}")
+    except:
+        pass
+
+    # Read every variant row in a single evaluate instead of several
+    # locator round-trips per row.
+    variant_rows = page.evaluate(r"""() => {
+        const isVisible = el => !!(el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length));
+        return Array.from(document.querySelectorAll("table tbody tr")).map((row, idx) => {
+            const inputs = row.querySelectorAll("input[type='text']");
+            const qtyInput = inputs.length ? inputs[inputs.length - 1] : null;
+            const priceInput = row.querySelector("input[data-bind*='textInput: newPrice']");
+            const firstCell = row.querySelector("td");
+            return {
+                idx: idx,
+                variant: firstCell ? firstCell.textContent.trim() : "",
+                qty: isVisible(qtyInput) ? qtyInput.value : "",
+                old_price: isVisible(priceInput) ? priceInput.value : "N/A",
+                n_matches: row.querySelectorAll("input[value='Match']").length
+            };
+        });
+    }""")
+    print(f"  Found {len(variant_rows)} variant rows.")
+    changes_made = False
+    report_rows = []
+
+    # Process Rows
+    for variant in variant_rows:
+        try:
+            qty_val = variant['qty']
+
+            if not qty_val.isdigit() or int(qty_val) <= 0:
+                continue
+
+            current_qty = int(qty_val)
+
+            # Extract Variant Name
+            variant_name = variant['variant']
+
+            # --- PRICE UPDATE LOGIC ---
+            old_price = "N/A"
+            new_price = "N/A"
+
+            if variant['n_matches'] >= 3:
+                old_price = variant['old_price']
+
+                if not dry_run:
+                    new_price = match_market_price(page, variant['idx'])
+                    changes_made = True
+                    status = "Updated"
+                else:
+                    status = "Dry Run"
+
+                print(f"      {variant_name}: Qty {current_qty} | {old_price} -> {new_price}")
+
+                # Add to Inventory List
+                row_data = {
+                    'Product ID': pid,
+                    'Name': product_name,
+                    'Set': set_name,
+                    'Category': category,
+                    'Number': number,
+                    'Rarity': rarity,
+                    'Variant': variant_name,
+                    'Qty': current_qty,
+                    'Old Price': old_price,
+                    'New Price': new_price,
+                    'Status': status
+                }
+
+                report_rows.append(row_data)
+            else:
+                print(f"      {variant_name}: Qty {current_qty} | No Match Button Found")
+
+        except Exception as e:
+            pass
+
+    if changes_made and not dry_run:
+        save_btn = page.get_by_role("button", name="Save", exact=True).first
+        if save_btn.is_visible():
+            # Continue as soon as the save request comes back instead of a fixed sleep
+            try:
+                with page.expect_response(lambda r: "save" in r.url.lower(), timeout=10000):
+                    save_btn.click()
+                print("  Saved.")
+            except Exception as e:
+                print(f"  Save response not seen: {e}")
+
+    return report_rows
+
+def record_result(state, index, report_rows):
+    """Writes a finished product's rows and advances the resume checkpoint (thread-safe)."""
+    with state['lock']:
+        for row_data in report_rows or []:
+            state['report_writer'].writerow(row_data)
+
+            # Update Stats
+            state['total_items'] += 1
+            try:
+                o_p = parse_price(str(row_data['Old Price']))
+                n_p = parse_price(str(row_data['New Price']))
+                if abs(n_p - o_p) > 0.001:
+                    state['total_changes'] += 1
+                    state['total_value_delta'] += (n_p - o_p) * int(row_data['Qty'])
+            except:
+                pass
+        state['report_fh'].flush()
+
+        # Workers finish out of order, so only checkpoint the last index
+        # before which every product is done. Resume then never skips work.
+        state['done'].add(index)
+        items = state['items']
+        while state['next_index'] in state['done']:
+            state['done'].discard(state['next_index'])
+            item_at = items[state['next_index']]
+            state['last_pid'] = item_at['id'] if isinstance(item_at, dict) else item_at
+            state['next_index'] += 1
+            state['unsaved'] += 1
+
+        # Update Progress (batched; the final/interrupted flush happens in main)
+        if state['unsaved'] >= PROGRESS_EVERY:
+            write_progress(state)
+
+def write_progress(state):
+    """Atomically writes the resume checkpoint. Caller must hold state['lock']."""
+    if state['last_pid'] is None or not state['unsaved']:
+        return
+    tmp_file = PROGRESS_FILE + ".tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump({
+            'last_processed_id': state['last_pid'],
+            'report_file': state['report_file'],
+            'timestamp': str(datetime.datetime.now())
+        }, f)
+    os.replace(tmp_file, PROGRESS_FILE)
+    state['unsaved'] = 0
+
+def process_queue(context, work, state, dry_run):
+    """Processes products from the shared work queue on a new tab in context."""
+    page = context.new_page()
+    page.set_default_timeout(60000)
+    page.route("**/*", block_heavy_resources)
+
+    total = len(state['items'])
+    try:
+        while not state['stop']:
+            try:
+                index, item = work.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                report_rows = process_product(page, item, index + 1, total, dry_run)
+            except Exception as e:
+                print(f"  Error processing item {index + 1}: {e}")
+                report_rows = None
+            record_result(state, index, report_rows)
+    finally:
+        page.close()
+
+def phase2_worker(work, state, dry_run):
+    """
+    Thread entry for extra Phase 2 workers.
+    Playwright's sync API is bound to the thread that started it, so each
+    extra worker opens its own CDP connection to the same Chrome.
+    """
+    with sync_playwright() as p:
+        try:
+            browser = p.chromium.connect_over_cdp("http://127.0.0.1:9222")
+            context = browser.contexts[0]
+        except Exception as e:
+            print(f"Error connecting to Chrome: {e}")
+            return
+        process_queue(context, work, state, dry_run)
+
 def main():
     parser = argparse.ArgumentParser(description="Sync TCGPlayer Inventory Prices")
     parser.add_argument("--live", action="store_true", help="Actually update prices (disable dry run)")
     parser.add_argument("--resume", action="store_true", help="Resume from last progress")
+    parser.add_argument("--workers", type=int, default=4, help="Number of browser tabs to process products in parallel")
     args = parser.parse_args()
     
     DRY_RUN = not args.live
@@ -39,15 +390,11 @@ def main():
     
     print("IMPORTANT: Ensure Chrome is running with --remote-debugging-port=9222")
     
-    product_ids = []
+    # Harvested products keyed by product ID (insertion order = catalog order)
+    product_ids = {}
     start_index = 0
     report_file_path = ""
     
-    # Stats tracking
-    total_items = 0
-    total_changes = 0
-    total_value_delta = 0.0
-
     # --- INITIALIZATION & RESUME LOGIC ---
     if args.resume:
         if os.path.exists(PROGRESS_FILE) and os.path.exists(HARVEST_FILE):
@@ -59,11 +406,17 @@ def main():
                 last_id = progress.get('last_processed_id')
                 report_file_path = progress.get('report_file')
                 
-                with open(HARVEST_FILE, 'r') as f:
-                    product_ids = json.load(f)
+                product_ids = load_harvest()
+                
+                # Older harvest files are a list of dicts (or bare ID strings)
+                if isinstance(product_ids, list):
+                    product_ids = {
+                        (item['id'] if isinstance(item, dict) else item): (item if isinstance(item, dict) else {'id': item})
+                        for item in product_ids
+                    }
                 
                 if last_id in product_ids:
-                    start_index = product_ids.index(last_id) + 1
+                    start_index = list(product_ids).index(last_id) + 1
                     print(f"Resuming after ID {last_id} (Index {start_index}/{len(product_ids)})")
                     print(f"Appending to report: {report_file_path}")
                 else:
@@ -77,21 +430,22 @@ def main():
             print("No progress file found. Starting fresh.")
             args.resume = False
 
-    if not args.resume:
-        # Fresh Start
-        report_file_path = os.path.join(OUTPUT_DIR, f"inventory_report_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
-        
-        # --- PHASE 1: HARVEST IDs ---
-        with sync_playwright() as p:
-            try:
-                browser = p.chromium.connect_over_cdp("http://127.0.0.1:9222")
-                context = browser.contexts[0]
-                page = context.pages[0] if context.pages else context.new_page()
-                page.set_default_timeout(60000)
-            except Exception as e:
-                print(f"Error connecting to Chrome: {e}")
-                return
+    # One CDP connection serves both phases (the main thread is also a Phase 2 worker)
+    with sync_playwright() as p:
+        try:
+            browser = p.chromium.connect_over_cdp("http://127.0.0.1:9222")
+            context = browser.contexts[0]
+            page = context.pages[0] if context.pages else context.new_page()
+            page.set_default_timeout(60000)
+        except Exception as e:
+            print(f"Error connecting to Chrome: {e}")
+            return
 
+        if not args.resume:
+            # Fresh Start
+            report_file_path = os.path.join(OUTPUT_DIR, f"inventory_report_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+            
+            # --- PHASE 1: HARVEST IDs ---
             print("\n--- PHASE 1: Harvesting Product IDs ---")
             page.goto("https://store.tcgplayer.com/admin/product/catalog")
             
@@ -108,9 +462,8 @@ def main():
                 
                 search_btn = page.get_by_role("button", name="Search", exact=True)
                 if search_btn.is_visible():
-                    search_btn.click()
+                    click_search(page, search_btn)
                     print("  Clicked Search")
-                    page.wait_for_selector("table tbody tr", timeout=10000)
                 else:
                     print("  Could not find Search button.")
             except Exception as e:
@@ -176,8 +529,8 @@ def main():
                 new_count = 0
                 for item in page_items:
                     # Check if ID already exists in our list
-                    if not any(existing['id'] == item['id'] for existing in product_ids):
-                        product_ids.append(item)
+                    if item['id'] not in product_ids:
+                        product_ids[item['id']] = item
                         new_count += 1
                 
                 print(f"  Found {new_count} new products on this page.")
@@ -185,8 +538,9 @@ def main():
                 try:
                     next_btn = page.get_by_role("link", name="Next", exact=True)
                     if next_btn.is_visible() and "disabled" not in next_btn.get_attribute("class", ""):
+                        prev_pid = page_items[0]['id'] if page_items else ""
                         next_btn.click()
-                        time.sleep(1) 
+                        wait_for_next_page(page, prev_pid)
                     else:
                         print("  End of catalog.")
                         break
@@ -196,234 +550,66 @@ def main():
             print(f"Total Products Found: {len(product_ids)}")
             
             # Save Harvest List (Rich Data)
-            with open(HARVEST_FILE, 'w') as f:
-                json.dump(product_ids, f)
+            save_harvest(product_ids)
             
             # Initialize Report File
             with open(report_file_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=['Product ID', 'Name', 'Set', 'Category', 'Number', 'Rarity', 'Variant', 'Qty', 'Old Price', 'New Price', 'Status'])
+                writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
                 writer.writeheader()
 
-    # --- PHASE 2: PROCESS & UPDATE ---
-    print("\n--- PHASE 2: Processing & Updating Prices ---")
-    
-    with sync_playwright() as p:
-        try:
-            browser = p.chromium.connect_over_cdp("http://127.0.0.1:9222")
-            context = browser.contexts[0]
-            page = context.pages[0] if context.pages else context.new_page()
-            page.set_default_timeout(60000)
-        except Exception as e:
-            print(f"Error connecting to Chrome: {e}")
-            return
-
-        for i in range(start_index, len(product_ids)):
-            item = product_ids[i]
-            # Handle both old format (string) and new format (dict) for backward compatibility
-            if isinstance(item, dict):
-                pid = item['id']
-                catalog_set = item.get('set', '')
-                catalog_cat = item.get('category', '')
-                catalog_rarity = item.get('rarity', '')
-                catalog_number = item.get('number', '')
-            else:
-                pid = item
-                catalog_set = ""
-                catalog_cat = ""
-                catalog_rarity = ""
-                catalog_number = ""
-
-            print(f"[{i+1}/{len(product_ids)}] Processing ID: {pid}")
-            
-            url = f"https://store.tcgplayer.com/admin/product/manage/{pid}"
-            
-            # Retry Logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    page.goto(url, timeout=45000)
-                    break
-                except Exception as e:
-                    print(f"  Navigation failed (Attempt {attempt+1}/{max_retries}): {e}")
-                    time.sleep(5)
-            else:
-                print("  Skipping this card due to repeated timeouts.")
-                continue
-            
-            try:
-                page.wait_for_load_state('domcontentloaded', timeout=10000)
-            except:
-                pass
-
-            # Check for table
-            try:
-                if not page.locator("table").first.is_visible():
-                    print("  No table found on page. Skipping.")
-                    continue
-            except:
-                pass
-            
-            product_name = "Unknown"
-            try:
-                # Strategy 1: Knockout data-bind (Most reliable)
-                span = page.locator("span[data-bind='text: productName']").first
-                if span.is_visible():
-                    product_name = span.text_content().strip()
-                
-                # Strategy 2: Link Title
-                if not product_name or product_name == "Unknown":
-                    link = page.locator("a.blue-button-sm").first
-                    if link.is_visible():
-                        title_attr = link.get_attribute("title")
-                        if title_attr:
-                            product_name = title_attr.replace("View all live prices for ", "").replace(" in a new tab!", "").strip()
-
-                # Strategy 3: H1 (Fallback)
-                if not product_name or product_name == "Unknown":
-                    h1 = page.locator("h1").first
-                    if h1.is_visible():
-                        text = h1.text_content().strip()
-                        if text and "Seller Portal" not in text:
-                            product_name = text
-                
-                # Strategy 4: Page Title (Last Resort)
-                if not product_name or product_name == "Unknown":
-                    title = page.title()
-                    if "-" in title:
-                        product_name = title.split("-")[1].strip()
-                    elif "Seller Portal" not in title:
-                        product_name = title
-
-                # Use Catalog Data for Set/Category/Rarity/Number
-                set_name = catalog_set
-                category = catalog_cat
-                rarity = catalog_rarity
-                number = catalog_number
-                
-                # Fallback Extraction if Catalog Data is missing
-                if not set_name:
-                    try:
-                        set_label = page.locator(".pInfo label", has_text="Set Name").first
-                        if set_label.is_visible():
-                            full_text = set_label.locator("..").text_content().strip()
-                            set_name = full_text.replace("Set Name", "").strip()
-                    except: pass
-                
-                if not category:
-                    try:
-                        link = page.locator("a.blue-button-sm").first
-                        if link.is_visible():
-                            href = link.get_attribute("href")
-                            if href and "/product/" in href:
-                                parts = href.split(f"/product/{pid}/")
-                                if len(parts) > 1:
-                                    slug = parts[1]
-                                    if slug.startswith("magic"): category = "Magic: The Gathering"
-                                    elif slug.startswith("pokemon"): category = "Pokemon"
-                                    elif slug.startswith("yugioh"): category = "Yu-Gi-Oh!"
-                                    elif slug.startswith("lorcana"): category = "Lorcana"
-                                    elif slug.startswith("star-wars"): category = "Star Wars"
-                                    else: category = slug.split("-")[0].capitalize()
-                    except: pass
-
-                print(f"  Product: {product_name} | Set: {set_name} | Cat: {category} | #: {number}")
-            except:
-                pass
-            
-            rows = page.locator("table tbody tr").all()
-            print(f"  Found {len(rows)} variant rows.")
-            changes_made = False
-            
-            # Process Rows
-            for row in rows:
+        # --- PHASE 2: PROCESS & UPDATE ---
+        print("\n--- PHASE 2: Processing & Updating Prices ---")
+        print(f"Using {args.workers} browser tab(s).")
+        
+        # Keep the report open for the whole run; rows are flushed once per product
+        report_fh = open(report_file_path, 'a', newline='', encoding='utf-8')
+        atexit.register(report_fh.close)
+        
+        items = list(product_ids.values())
+        
+        # Shared between workers, guarded by 'lock'
+        state = {
+            'lock': threading.Lock(),
+            'report_fh': report_fh,
+            'report_writer': csv.DictWriter(report_fh, fieldnames=REPORT_FIELDS),
+            'report_file': report_file_path,
+            'items': items,
+            'done': set(),
+            'next_index': start_index,
+            'last_pid': None,
+            'unsaved': 0,
+            'stop': False,
+            'total_items': 0,
+            'total_changes': 0,
+            'total_value_delta': 0.0,
+        }
+        
+        work = queue.Queue()
+        for i in range(start_index, len(items)):
+            work.put((i, items[i]))
+        
+        # Ctrl-C: let in-flight products finish, then save progress below.
+        # A second Ctrl-C falls back to the default (immediate) interrupt.
+        def handle_sigint(signum, frame):
+            print("\nInterrupted - finishing current products and saving progress...")
+            state['stop'] = True
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGINT, handle_sigint)
+        
+        # Extra workers get their own connection; this thread reuses the one above
+        with ThreadPoolExecutor(max_workers=max(1, args.workers - 1)) as pool:
+            workers = [pool.submit(phase2_worker, work, state, DRY_RUN) for _ in range(args.workers - 1)]
+            process_queue(context, work, state, DRY_RUN)
+            # Failures outside the per-product try (opening a tab, writing the
+            # report) end that worker; surface them instead of losing them
+            for future in workers:
                 try:
-                    inputs = row.locator("input[type='text']").all()
-                    if not inputs: continue
-                    qty_input = inputs[-1]
-                    if not qty_input.is_visible(): continue
-                    qty_val = qty_input.input_value(timeout=500)
-                    
-                    if not qty_val.isdigit() or int(qty_val) <= 0:
-                        continue
-                    
-                    current_qty = int(qty_val)
-                    
-                    # Extract Variant Name
-                    variant_name = row.locator("td").first.text_content().strip()
-                    
-                    # --- PRICE UPDATE LOGIC ---
-                    match_btns = row.locator("input[value='Match']").all()
-                    
-                    old_price = "N/A"
-                    new_price = "N/A"
-                    
-                    if len(match_btns) >= 3:
-                        market_btn = match_btns[2] # 0-indexed, so 3rd button
-                        
-                        price_input = row.locator("input[data-bind*='textInput: newPrice']").first
-                        if price_input.is_visible():
-                            old_price = price_input.input_value()
-                        
-                        if not DRY_RUN:
-                            market_btn.click()
-                            if price_input.is_visible():
-                                new_price = price_input.input_value()
-                            changes_made = True
-                            status = "Updated"
-                        else:
-                            status = "Dry Run"
-                            
-                        print(f"      {variant_name}: Qty {current_qty} | {old_price} -> {new_price}")
-                        
-                        # Add to Inventory List
-                        row_data = {
-                            'Product ID': pid,
-                            'Name': product_name,
-                            'Set': set_name,
-                            'Category': category,
-                            'Number': number,
-                            'Rarity': rarity,
-                            'Variant': variant_name,
-                            'Qty': current_qty,
-                            'Old Price': old_price,
-                            'New Price': new_price,
-                            'Status': status
-                        }
-                        
-                        with open(report_file_path, 'a', newline='', encoding='utf-8') as f:
-                            writer = csv.DictWriter(f, fieldnames=['Product ID', 'Name', 'Set', 'Category', 'Number', 'Rarity', 'Variant', 'Qty', 'Old Price', 'New Price', 'Status'])
-                            writer.writerow(row_data)
-
-                        # Update Stats
-                        total_items += 1
-                        try:
-                            o_p = float(str(old_price).replace('$','').replace(',',''))
-                            n_p = float(str(new_price).replace('$','').replace(',',''))
-                            if abs(n_p - o_p) > 0.001:
-                                total_changes += 1
-                                total_value_delta += (n_p - o_p) * int(current_qty)
-                        except:
-                            pass
-                    else:
-                        print(f"      {variant_name}: Qty {current_qty} | No Match Button Found")
-
+                    future.result()
                 except Exception as e:
-                    pass
-            
-            if changes_made and not DRY_RUN:
-                save_btn = page.get_by_role("button", name="Save", exact=True).first
-                if save_btn.is_visible():
-                    save_btn.click()
-                    time.sleep(2.5) 
-                    print("  Saved.")
-            
-            # Update Progress
-            with open(PROGRESS_FILE, 'w') as f:
-                json.dump({
-                    'last_processed_id': pid,
-                    'report_file': report_file_path,
-                    'timestamp': str(datetime.datetime.now())
-                }, f)
+                    logging.error(f"Phase 2 worker failed: {e}")
+        
+        with state['lock']:
+            write_progress(state)
 
     # --- SUMMARY ---
     print("="*40 + "\n")
@@ -0,0 +1,30 @@
+# True once the manage page's variant table has rows and Knockout has bound
+# every row's qty input (a bound input always holds a number, if only "0")
+TABLE_BOUND_JS = r"""() => {
+    const rows = document.querySelectorAll("table tbody tr");
+    return rows.length > 0 && Array.from(rows).every(row => {
+        const inputs = row.querySelectorAll("input[type='text']");
+        return !inputs.length || inputs[inputs.length - 1].value !== "";
+    });
+}"""
+
+def click_search(page, search_btn):
+    """Clicks Search and returns as soon as the catalog search request completes."""
+    try:
+        with page.expect_response(lambda r: "/catalog" in r.url.lower() and r.request.method == "POST", timeout=10000):
+            search_btn.click()
+    except Exception:
+        # Search didn't go through a request we recognise; fall back to the DOM
+        page.wait_for_selector("table tbody tr", timeout=10000)
+
+def wait_for_next_page(page, prev_pid, timeout=10000):
+    """Waits until the catalog table's first product differs from prev_pid (i.e. the next page rendered)."""
+    try:
+        page.wait_for_function(r"""pid => {
+            const link = document.querySelector("table tbody tr a[href*='/admin/product/manage/']");
+            if (!link) return false;
+            const match = link.getAttribute('href').match(/manage\/(\d+)/);
+            return !match || match[1] !== pid;
+        }""", arg=prev_pid, timeout=timeout)
+    except Exception as e:
+        print(f"  Timed out waiting for next page: {e}")
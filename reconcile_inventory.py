@@ -1,12 +1,29 @@
+import atexit
 import csv
 import time
 import logging
+import logging.handlers
 import datetime
+import functools
+import itertools
 import requests
 import json
 import os
+import pickle
+import re
 import argparse
-from playwright.sync_api import sync_playwright
+import asyncio
+import queue
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    import ijson # Optional: streams the bulk dump instead of loading it whole
+except ImportError:
+    ijson = None
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+from http_utils import acquire_slot
+from page_utils import TABLE_BOUND_JS
 
 # Configuration
 OUTPUT_DIR = "output"
@@ -14,17 +31,88 @@ if not os.path.exists(OUTPUT_DIR):
     os.makedirs(OUTPUT_DIR)
 
 CACHE_FILE = "tcg_id_cache.json"
+# API lookups between ID cache checkpoints
+CACHE_SAVE_EVERY = 50
+# CSV rows read, resolved and reconciled per pass (bounds memory on huge files)
+CSV_CHUNK_SIZE = 500
+# Products reconciled concurrently (size of the browser tab pool)
+MAX_PARALLEL = 4
+# Max identifiers Scryfall accepts per /cards/collection request
+SCRYFALL_BATCH_SIZE = 75
+# Scryfall's daily bulk dump (--scryfall-bulk) and the id -> tcgplayer_id index built from it
+SCRYFALL_BULK_FILE = os.path.join(OUTPUT_DIR, "scryfall_bulk.json")
+SCRYFALL_BULK_INDEX = os.path.join(OUTPUT_DIR, "scryfall_bulk.pkl")
+SCRYFALL_BULK_MAX_AGE = 24 * 60 * 60
+# Single-card API lookups in flight at once; acquire_slot caps the request rate
+API_CONCURRENCY = 10
+# Numeric ID in a TCGPlayer product URL: https://www.tcgplayer.com/product/123456/...
+PRODUCT_ID_RE = re.compile(r'/product/(\d+)')
+# Seconds before a name the admin search found nothing for is searched again
+SEARCH_MISS_TTL = 24 * 60 * 60
+# Resources the variant table doesn't need; aborted on the worker tabs.
+# Stylesheets stay: the Save button lookup and is_visible() depend on CSS.
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+# Candidate "Match" price buttons within a variant row
+MATCH_BUTTON_SELECTOR = "button, input[type='button'], a.btn"
+# Reads the manage page's variant table in one round-trip. match_buttons holds
+# the indices (among MATCH_BUTTON_SELECTOR hits) of the buttons labelled Match.
+VARIANT_ROWS_JS = r"""(selector) => {
+    return Array.from(document.querySelectorAll("table tbody tr")).map((row, idx) => {
+        const firstCell = row.querySelector("td");
+        const inputs = row.querySelectorAll("input[type='text']");
+        const buttons = Array.from(row.querySelectorAll(selector));
+        return {
+            idx: idx,
+            variant: firstCell ? firstCell.textContent.trim() : "",
+            qty: inputs.length ? inputs[inputs.length - 1].value : null,
+            match_buttons: buttons
+                .map((b, i) => ((b.tagName === "INPUT" ? b.value : b.textContent) || "").includes("Match") ? i : -1)
+                .filter(i => i >= 0)
+        };
+    });
+}"""
+# Settles on the admin search's results for `name`: null while the pre-search
+# document (still marked with __preSearch after a full-page POST) or a table
+# that doesn't reflect the search is showing, else {href} of the first manage
+# link naming the card ("" when the table has no products at all).
+SEARCH_RESULT_JS = r"""({name, navigated}) => {
+    if (navigated && window.__preSearch) return null;
+    const table = document.querySelector("table.sTable");
+    if (!table || document.readyState === "loading") return null;
+    const links = Array.from(table.querySelectorAll("tbody tr td a"))
+        .filter(a => (a.getAttribute("href") || "").includes("manage/"));
+    if (!links.length) return {href: ""};
+    const wanted = name.toLowerCase();
+    const hit = links.find(a => a.textContent.toLowerCase().includes(wanted));
+    return hit ? {href: hit.getAttribute("href")} : null;
+}"""
 LOG_FILE = os.path.join(OUTPUT_DIR, f"reconcile_log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
 
 # Setup Logging
+# Records are only enqueued on the calling thread; a background listener
+# does the formatting and disk/console writes.
+log_queue = queue.Queue(-1)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
+    format='%(message)s', # QueueHandler bakes this into the record; the listener adds the timestamp
+    handlers=[logging.handlers.QueueHandler(log_queue)]
 )
+log_formatter = logging.Formatter('%(asctime)s - %(message)s')
+log_handlers = [logging.FileHandler(LOG_FILE), logging.StreamHandler()]
+for handler in log_handlers:
+    handler.setFormatter(log_formatter)
+log_listener = logging.handlers.QueueListener(log_queue, *log_handlers)
+log_listener.start()
+atexit.register(log_listener.stop) # Drains anything still queued
+
+# Pooled session for the Scryfall / Pokemon lookups and product URL checks
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=API_CONCURRENCY,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+))
+
 
 def load_cache():
     if os.path.exists(CACHE_FILE):
@@ -32,6 +120,13 @@ def load_cache():
             return json.load(f)
     return {}
 
+def cached_tcg_id(cache, key):
+    """Reads a Scryfall ID's cached TCGPlayer ID; upload_cards stores {"tcg_id": ..., "ts": ...} rather than the bare ID."""
+    value = cache.get(key)
+    if isinstance(value, dict):
+        value = value.get('tcg_id')
+    return str(value) if value is not None else None
+
 def save_cache(cache):
     with open(CACHE_FILE, 'w') as f:
         json.dump(cache, f)
@@ -42,29 +137,116 @@ except ImportError:
     POKEMON_API_KEY = ""
     logging.warning("No config.py found. Pokemon API features may be limited.")
 
+@functools.lru_cache(maxsize=4096)
+def fetch_scryfall_tcg_id(scryfall_id):
+    """Looks up a card's TCGPlayer ID on Scryfall. Memoized; errors raise (and aren't cached)."""
+    url = f"https://api.scryfall.com/cards/{scryfall_id}"
+    acquire_slot() # Rate limit
+    response = SESSION.get(url, timeout=15)
+    if response.status_code == 200:
+        tcg_id = response.json().get('tcgplayer_id')
+        if tcg_id:
+            return str(tcg_id)
+    return None
+
 def get_tcgplayer_id_from_scryfall(scryfall_id, cache):
     if scryfall_id in cache:
-        return cache[scryfall_id]
+        return cached_tcg_id(cache, scryfall_id)
     
-    url = f"https://api.scryfall.com/cards/{scryfall_id}"
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            tcg_id = data.get('tcgplayer_id')
-            if tcg_id:
-                cache[scryfall_id] = str(tcg_id)
-                return str(tcg_id)
+        tcg_id = fetch_scryfall_tcg_id(scryfall_id)
+        if tcg_id:
+            cache[scryfall_id] = tcg_id
+            return tcg_id
     except Exception as e:
         logging.error(f"Scryfall API error: {e}")
     return None
 
-def get_tcgplayer_id_from_pokemon_api(card_name, set_name, cache):
-    # Check cache first
-    cache_key = f"pokemon_{card_name}_{set_name}"
-    if cache_key in cache:
-        return cache[cache_key]
+def prefetch_scryfall_ids(rows, cache):
+    """
+    Resolves every uncached Scryfall ID in rows via /cards/collection,
+    SCRYFALL_BATCH_SIZE at a time. Returns the set of IDs Scryfall answered
+    for (found or not), so callers don't look them up again one by one.
+    """
+    # Unique, uncached IDs for rows that still need resolving (dict keeps CSV order)
+    missing = list(dict.fromkeys(
+        row['Scryfall ID'] for row in rows
+        if row.get('Scryfall ID') and row['Scryfall ID'] not in cache
+        and not (row.get('Product ID') or row.get('TCGPlayer ID'))
+    ))
+    
+    checked = set()
+    if not missing:
+        return checked
+    
+    logging.info(f"Resolving {len(missing)} Scryfall IDs in batches of {SCRYFALL_BATCH_SIZE}...")
+    for start in range(0, len(missing), SCRYFALL_BATCH_SIZE):
+        chunk = missing[start:start + SCRYFALL_BATCH_SIZE]
+        try:
+            acquire_slot() # Rate limit
+            response = SESSION.post(
+                "https://api.scryfall.com/cards/collection",
+                json={"identifiers": [{"id": scry_id} for scry_id in chunk]},
+                timeout=30
+            )
+            response.raise_for_status()
+            for card in response.json().get('data', []):
+                tcg_id = card.get('tcgplayer_id')
+                if tcg_id:
+                    cache[card['id']] = str(tcg_id)
+            checked.update(chunk)
+        except Exception as e:
+            logging.error(f"Scryfall collection API error: {e}")
+    
+    save_cache(cache)
+    return checked
+
+def is_fresh(path, max_age):
+    return os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age
+
+def bootstrap_scryfall_bulk():
+    """
+    Returns {scryfall_id: tcgplayer_id} for every card in Scryfall's
+    default_cards bulk dump. The dump is re-downloaded at most once per
+    SCRYFALL_BULK_MAX_AGE, and the index is pickled for fast reloads.
+    """
+    if is_fresh(SCRYFALL_BULK_INDEX, SCRYFALL_BULK_MAX_AGE):
+        with open(SCRYFALL_BULK_INDEX, 'rb') as f:
+            return pickle.load(f)
+
+    if not is_fresh(SCRYFALL_BULK_FILE, SCRYFALL_BULK_MAX_AGE):
+        response = SESSION.get("https://api.scryfall.com/bulk-data", timeout=30)
+        response.raise_for_status()
+        download_uri = next(
+            entry['download_uri'] for entry in response.json()['data']
+            if entry['type'] == 'default_cards'
+        )
+        logging.info(f"Downloading Scryfall bulk data from {download_uri}...")
+        tmp_path = SCRYFALL_BULK_FILE + ".tmp"
+        with SESSION.get(download_uri, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    f.write(chunk)
+        os.replace(tmp_path, SCRYFALL_BULK_FILE)
+
+    logging.info("Indexing Scryfall bulk data...")
+    with open(SCRYFALL_BULK_FILE, 'rb') as f:
+        cards = ijson.items(f, 'item') if ijson else json.load(f)
+        bulk = {card['id']: str(card['tcgplayer_id']) for card in cards if card.get('tcgplayer_id')}
 
+    tmp_path = SCRYFALL_BULK_INDEX + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(bulk, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, SCRYFALL_BULK_INDEX)
+    return bulk
+
+@functools.lru_cache(maxsize=4096)
+def fetch_pokemon_tcg_id(card_name, set_name):
+    """
+    Finds a card on the Pokemon TCG API and resolves its TCGPlayer ID.
+    Memoized; errors raise (and aren't cached).
+    """
     logging.info(f"  Searching Pokemon API for: {card_name}...")
     url = "https://api.pokemontcg.io/v2/cards"
     headers = {'X-Api-Key': POKEMON_API_KEY}
@@ -73,249 +255,414 @@ def get_tcgplayer_id_from_pokemon_api(card_name, set_name, cache):
     query = f'name:"{card_name}"'
     params = {'q': query, 'pageSize': 10}
     
-    try:
-        response = requests.get(url, headers=headers, params=params, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-        
-        if data['count'] == 0:
-            logging.info("    No matches found.")
-            return None
-            
-        # Filter by set name if provided
-        best_match = None
-        if set_name:
-            for card in data['data']:
-                api_set = card['set']['name']
-                # Simple fuzzy match
-                if set_name.lower() in api_set.lower() or api_set.lower() in set_name.lower():
-                    best_match = card
-                    break
+    response = SESSION.get(url, headers=headers, params=params, timeout=15)
+    response.raise_for_status()
+    data = response.json()
+    
+    if data['count'] == 0:
+        logging.info("    No matches found.")
+        return None
         
-        if not best_match:
-            best_match = data['data'][0] # Fallback
-            
-        # Get TCGPlayer URL
-        tcg_data = best_match.get('tcgplayer', {})
-        tcg_url = tcg_data.get('url')
+    # Filter by set name if provided
+    best_match = None
+    if set_name:
+        for card in data['data']:
+            api_set = card['set']['name']
+            # Simple fuzzy match
+            if set_name.lower() in api_set.lower() or api_set.lower() in set_name.lower():
+                best_match = card
+                break
+    
+    if not best_match:
+        best_match = data['data'][0] # Fallback
         
-        if tcg_url:
-            # Follow redirect to get numeric ID
-            try:
-                logging.info(f"    Resolving TCGPlayer URL: {tcg_url}...")
-                r = requests.head(tcg_url, allow_redirects=True, timeout=10)
-                final_url = r.url
-                
-                # Extract ID: https://www.tcgplayer.com/product/123456/...
-                import re
-                match = re.search(r'/product/(\d+)', final_url)
-                if match:
-                    tcg_id = match.group(1)
-                    logging.info(f"    -> Found ID: {tcg_id}")
-                    cache[cache_key] = tcg_id
-                    return tcg_id
-                else:
-                    logging.warning("    -> Could not extract ID from resolved URL.")
-            except Exception as e:
-                logging.error(f"    -> Error resolving URL: {e}")
-        else:
-            logging.info("    No TCGPlayer URL in API response.")
+    # Get TCGPlayer URL
+    tcg_data = best_match.get('tcgplayer', {})
+    tcg_url = tcg_data.get('url')
+    
+    if not tcg_url:
+        logging.info("    No TCGPlayer URL in API response.")
+        return None
+    
+    # Extract ID: https://www.tcgplayer.com/product/123456/...
+    # Some API URLs already point at the product page, so no round-trip needed
+    match = PRODUCT_ID_RE.search(tcg_url)
+    if not match:
+        # Follow redirect to get numeric ID
+        logging.info(f"    Resolving TCGPlayer URL: {tcg_url}...")
+        r = SESSION.head(tcg_url, allow_redirects=True, timeout=5)
+        match = PRODUCT_ID_RE.search(r.url)
+    if not match:
+        logging.warning("    -> Could not extract ID from resolved URL.")
+        return None
+    
+    tcg_id = match.group(1)
+    logging.info(f"    -> Found ID: {tcg_id}")
+    return tcg_id
 
+def get_tcgplayer_id_from_pokemon_api(card_name, set_name, cache):
+    # Check cache first
+    cache_key = f"pokemon_{card_name}_{set_name}"
+    if cache_key in cache:
+        return cache[cache_key]
+
+    try:
+        tcg_id = fetch_pokemon_tcg_id(card_name, set_name)
+        if tcg_id:
+            cache[cache_key] = tcg_id
+        return tcg_id
     except Exception as e:
         logging.error(f"    Pokemon API Error: {e}")
         
     return None
 
-def search_product_id(page, name):
-    """Searches for a product by name on the Admin portal and returns its ID."""
+async def resolve_api_ids(rows, cache, scryfall_checked):
+    """
+    Resolves every distinct card that still needs a single-card API lookup
+    (Scryfall IDs the batch prefetch missed, Pokemon name/set pairs) exactly
+    once, API_CONCURRENCY at a time, so the browser pass only sees cache hits.
+    """
+    # Unique lookups, in CSV order; copies of a card in other conditions share one
+    scry_ids = {}
+    pokemon_cards = {}
+    for row in rows:
+        if row.get('Product ID') or row.get('TCGPlayer ID'):
+            continue
+        scry_id = row.get('Scryfall ID')
+        if scry_id:
+            if scry_id not in scryfall_checked and scry_id not in cache:
+                scry_ids[scry_id] = None
+        elif "Pokemon" in row.get('Category', ''):
+            name, set_name = row.get('Name', 'Unknown'), row.get('Set', '')
+            if f"pokemon_{name}_{set_name}" not in cache:
+                pokemon_cards[(name, set_name)] = None
+    if not scry_ids and not pokemon_cards:
+        return
+
+    semaphore = asyncio.Semaphore(API_CONCURRENCY)
+    resolved = 0
+
+    async def resolve(func, *args):
+        # Persist the ID cache every CACHE_SAVE_EVERY lookups rather than per resolution
+        nonlocal resolved
+        async with semaphore:
+            await asyncio.to_thread(func, *args, cache)
+        resolved += 1
+        if resolved % CACHE_SAVE_EVERY == 0:
+            # Snapshot first: worker threads may still be adding entries
+            save_cache(dict(cache))
+
+    logging.info(f"Resolving {len(scry_ids)} Scryfall IDs and {len(pokemon_cards)} Pokemon cards via single-card API lookups...")
+    await asyncio.gather(
+        *[resolve(get_tcgplayer_id_from_scryfall, scry_id) for scry_id in scry_ids],
+        *[resolve(get_tcgplayer_id_from_pokemon_api, name, set_name) for name, set_name in pokemon_cards]
+    )
+    scryfall_checked.update(scry_ids)
+    save_cache(cache)
+
+async def search_product_id(page, name, cache):
+    """
+    Searches for a product by name on the Admin portal and returns its ID.
+    Hits are cached under SEARCH_<name>; misses are remembered for SEARCH_MISS_TTL.
+    """
+    cache_key = f"SEARCH_{name.lower().strip()}"
+    cached = cache.get(cache_key)
+    if isinstance(cached, dict):
+        # Negative entry: {"pid": None, "ts": <when we last searched>}
+        if time.time() - cached.get('ts', 0) < SEARCH_MISS_TTL:
+            return None
+    elif cached:
+        return cached
+
     try:
         logging.info(f"  Searching for ID: '{name}'...")
         # Navigate to Catalog Search
-        page.goto("https://store.tcgplayer.com/admin/product/catalog")
+        # Don't wait for the whole page; fill() below waits for the search box itself
+        await page.goto("https://store.tcgplayer.com/admin/product/catalog", wait_until="commit")
         
         # Type name in search box
-        page.fill("input#ProductName", name)
-        page.click("input#searchButton")
-        page.wait_for_load_state('domcontentloaded')
-        
-        # Look for first result link: /admin/product/manage/{id}
-        # The table usually has a "Manage" link or the Name links to it.
-        # Selector for the "Product Name" link in the results table
-        link = page.locator("table.sTable tbody tr td a").first
-        href = link.get_attribute("href")
+        await page.fill("input#ProductName", name)
+        # Tie the read below to this search: mark the current document, wait for
+        # the catalog POST, then for a results table that belongs to it. If the
+        # POST was a full-page navigation the response arrives before the new
+        # document commits, so the marked (old) document is never read.
+        try:
+            await page.evaluate("() => { window.__preSearch = true; }")
+            async with page.expect_response(lambda r: "/catalog" in r.url.lower() and r.request.method == "POST", timeout=10000) as response_info:
+                await page.click("input#searchButton")
+            response = await response_info.value
+            result = await page.wait_for_function(
+                SEARCH_RESULT_JS,
+                arg={"name": name, "navigated": response.request.is_navigation_request()},
+                timeout=10000
+            )
+            href = (await result.json_value())['href']
+        except PlaywrightTimeoutError:
+            # Slow or lost search, or a table we can't tie to it: a transient
+            # failure, so nothing is cached
+            logging.error(f"  Search timed out for '{name}'")
+            return None
         
-        if href and "manage/" in href:
+        # Result links point at /admin/product/manage/{id}
+        if href:
             # Extract ID from /admin/product/manage/123456
-            return href.split("/")[-1]
+            pid = href.split("/")[-1]
+            cache[cache_key] = pid
+            return pid
+        # This search's results table rendered with no products in it: a genuine miss
+        cache[cache_key] = {"pid": None, "ts": time.time()}
     except Exception as e:
         logging.error(f"  Search failed: {e}")
     return None
 
-def main():
-    parser = argparse.ArgumentParser(description="Reconcile TCGPlayer Inventory from Master CSV")
-    parser.add_argument("csv_file", help="Path to the Master CSV file")
-    parser.add_argument("--live", action="store_true", help="Actually update inventory (disable dry run)")
-    args = parser.parse_args()
-    
-    DRY_RUN = not args.live
-    
-    logging.info("Starting Inventory Reconciliation...")
-    if DRY_RUN:
-        logging.info("!!! DRY RUN MODE - No changes will be made !!!")
+async def block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
     else:
-        logging.info("!!! LIVE MODE - INVENTORY WILL BE OVERWRITTEN !!!")
+        await route.continue_()
 
-    # Load Cache
-    cache = load_cache()
+def variant_key(text):
+    """Splits a variant label into (base condition, is_foil), e.g. "Near Mint Foil" -> ("near mint", True)."""
+    lowered = text.lower()
+    return lowered.replace("foil", "").strip(), "foil" in lowered
 
-    # Read CSV
-    try:
-        with open(args.csv_file, 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
-    except Exception as e:
-        logging.error(f"Could not read CSV: {e}")
-        return
+def cached_product_id(row, cache):
+    """Returns a row's Product ID from the CSV or the ID cache, without any network calls."""
+    pid = row.get('Product ID') or row.get('TCGPlayer ID')
+    if pid:
+        return pid
+    scry_id = row.get('Scryfall ID')
+    if scry_id:
+        return cached_tcg_id(cache, scry_id)
+    if "Pokemon" in row.get('Category', ''):
+        return cache.get(f"pokemon_{row.get('Name', 'Unknown')}_{row.get('Set', '')}")
+    return None
 
-    logging.info(f"Loaded {len(rows)} rows from {args.csv_file}")
+async def search_product_ids(pages, cache, names):
+    """Admin-searches each distinct name once on tabs borrowed from the pool; returns {name: pid}."""
+    async def search(name):
+        page = await pages.get()
+        try:
+            pid = await search_product_id(page, name, cache)
+        finally:
+            pages.put_nowait(page)
+        if pid:
+            logging.info(f"  Found ID via Search: {pid}")
+        return pid
+
+    names = list(dict.fromkeys(names))
+    return dict(zip(names, await asyncio.gather(*[search(name) for name in names])))
 
-    with sync_playwright() as p:
+async def reconcile_product(pages, pid, entries, dry_run):
+    """
+    Reconciles every CSV row for one product on a tab borrowed from the pool:
+    one page load, all variant rows updated, one save.
+    """
+    page = await pages.get()
+    try:
+        # 1. Navigate
+        url = f"https://store.tcgplayer.com/admin/product/manage/{pid}"
         try:
-            browser = p.chromium.connect_over_cdp("http://127.0.0.1:9222")
-            context = browser.contexts[0]
-            page = context.pages[0] if context.pages else context.new_page()
-            page.set_default_timeout(60000)
+            # Wait for the variant table to be parsed and bound, not for the
+            # page's background requests
+            await page.goto(url, wait_until="commit")
+            await page.wait_for_load_state("domcontentloaded")
+            await page.wait_for_function(TABLE_BOUND_JS, timeout=10000)
         except Exception as e:
-            logging.error(f"Error connecting to Chrome: {e}")
+            logging.error(f"  Navigation failed: {e}")
             return
 
-        for i, row in enumerate(rows):
-            # 1. Identify Product ID
-            pid = row.get('Product ID') or row.get('TCGPlayer ID')
-            scry_id = row.get('Scryfall ID')
-            name = row.get('Name', 'Unknown')
-            category = row.get('Category', '')
-            set_name = row.get('Set', '')
-            
-            # If no PID, try to resolve
-            if not pid:
-                # Strategy 1: Scryfall (for Magic)
-                if scry_id:
-                    logging.info(f"[{i+1}] Resolving ID for {name} via Scryfall...")
-                    pid = get_tcgplayer_id_from_scryfall(scry_id, cache)
-                
-                # Strategy 2: Pokemon API (for Pokemon)
-                elif category == "Pokemon" or "Pokemon" in category:
-                    logging.info(f"[{i+1}] Resolving ID for {name} via Pokemon API...")
-                    pid = get_tcgplayer_id_from_pokemon_api(name, set_name, cache)
-                
-                # Strategy 3: Search by Name (Fallback)
-                if not pid and name and name != "Unknown":
-                    pid = search_product_id(page, name)
-                    if pid:
-                        logging.info(f"  Found ID via Search: {pid}")
-                
-                if pid:
-                    save_cache(cache)
-            
-            if not pid:
-                logging.warning(f"[{i+1}] SKIPPING {name}: No Product ID found.")
-                continue
+        # One evaluate for the whole variant table
+        variant_rows = await page.evaluate(VARIANT_ROWS_JS, MATCH_BUTTON_SELECTOR)
+        changes_made = False
 
+        # Normalize each DOM variant once; exact (base, foil) hits are a dict lookup
+        keyed_rows = [(variant_key(variant['variant']), variant) for variant in variant_rows]
+        rows_by_key = {}
+        for key, variant in keyed_rows:
+            rows_by_key.setdefault(key, variant)
+
+        for i, row in entries:
             # 2. Target Data
+            name = row.get('Name', 'Unknown')
             target_qty = int(row.get('Qty', 0))
             # Normalize condition text (e.g. "Near Mint" -> "Near Mint")
             target_variant = row.get('Variant') or row.get('Condition', '')
-            
-            logging.info(f"[{i+1}/{len(rows)}] Reconciling {name} (ID: {pid}) -> {target_variant}: {target_qty}")
 
-            # 3. Navigate
-            url = f"https://store.tcgplayer.com/admin/product/manage/{pid}"
-            try:
-                page.goto(url)
-                page.wait_for_load_state('domcontentloaded')
-            except Exception as e:
-                logging.error(f"  Navigation failed: {e}")
-                continue
+            logging.info(f"[{i+1}] Reconciling {name} (ID: {pid}) -> {target_variant}: {target_qty}")
 
-            # 4. Find Row
-            rows_elements = page.locator("table tbody tr").all()
-            target_row_found = False
-            changes_made = False
+            # 3. Find Row
+            # The CSV 'Variant' might be "Near Mint Foil" or just "Near Mint":
+            # foil status must match exactly, and the base condition must be
+            # contained in the row's (exact matches first, then the first partial one)
+            target_base, target_is_foil = variant_key(target_variant)
+            variant = rows_by_key.get((target_base, target_is_foil)) or next(
+                (v for (row_base, row_is_foil), v in keyed_rows
+                 if row_is_foil == target_is_foil and target_base in row_base),
+                None
+            )
+            target_row_found = variant is not None
 
-            for r in rows_elements:
-                try:
-                    # Check Variant Name
-                    variant_text = r.locator("td").first.text_content().strip()
-                    
-                    # Simple fuzzy match or exact match
-                    # The CSV 'Variant' might be "Near Mint Foil" or just "Near Mint"
-                    # We need to be careful.
-                    # Strict Variant Matching
-                    # Ensure "Foil" status matches exactly
-                    target_is_foil = "foil" in target_variant.lower()
-                    row_is_foil = "foil" in variant_text.lower()
-                    
-                    if target_is_foil != row_is_foil:
-                        continue
-                        
-                    # Check if the base condition matches (e.g. "Near Mint")
-                    # Remove "Foil" from both to compare base condition
-                    target_base = target_variant.lower().replace("foil", "").strip()
-                    row_base = variant_text.lower().replace("foil", "").strip()
-                    
-                    if target_base not in row_base:
-                        continue
-                    
-                    # Found the row!
-                    target_row_found = True
-                    
-                    # Check Current Qty
-                    inputs = r.locator("input[type='text']").all()
-                    if not inputs: continue
-                    qty_input = inputs[-1]
-                    
-                    current_qty_val = qty_input.input_value()
+            try:
+                # Check Current Qty
+                current_qty_val = variant['qty'] if variant else None
+                if current_qty_val is not None:
                     current_qty = int(current_qty_val) if current_qty_val.isdigit() else 0
-                    
+
+                    # Only the winning row goes back through locators
+                    r = page.locator("table tbody tr").nth(variant['idx'])
+
                     # UPDATE QUANTITY
                     if current_qty != target_qty:
                         logging.info(f"    Qty Mismatch: Store {current_qty} vs CSV {target_qty} -> Updating...")
-                        if not DRY_RUN:
-                            qty_input.fill(str(target_qty))
+                        if not dry_run:
+                            await r.locator("input[type='text']").last.fill(str(target_qty))
                             changes_made = True
                     else:
                         logging.info(f"    Qty Match: {current_qty}")
 
                     # UPDATE PRICE (Always Match Market while we are here)
-                    match_buttons = r.locator("button, input[type='button'], a.btn").filter(has_text="Match").all()
-                    if not match_buttons: match_buttons = r.locator("text=Match").all()
-                    
-                    if len(match_buttons) >= 1:
-                        market_btn = match_buttons[2] if len(match_buttons) >= 3 else match_buttons[-1]
-                        if not DRY_RUN:
-                            market_btn.click()
+                    match_buttons = r.locator(MATCH_BUTTON_SELECTOR)
+                    picks = variant['match_buttons']
+                    if not picks:
+                        match_buttons = r.locator("text=Match")
+                        picks = list(range(await match_buttons.count()))
+
+                    if len(picks) >= 1:
+                        market_btn = match_buttons.nth(picks[2] if len(picks) >= 3 else picks[-1])
+                        if not dry_run:
+                            await market_btn.click()
                             changes_made = True
                             # Optional: Check for anomalies here?
-                    
-                    break # Stop looking for rows once found
-                except Exception as e:
-                    pass
-            
+            except Exception as e:
+                pass
+
             if not target_row_found:
                 logging.warning(f"  Could not find variant row for '{target_variant}'")
 
-            # 5. Save
-            if changes_made and not DRY_RUN:
-                save_btn = page.get_by_role("button", name="Save", exact=True).first
-                if save_btn.is_visible():
-                    save_btn.click()
-                    time.sleep(2.5)
+        # 4. Save (once for all of this product's rows)
+        if changes_made and not dry_run:
+            save_btn = page.get_by_role("button", name="Save", exact=True).first
+            if await save_btn.is_visible():
+                try:
+                    async with page.expect_response(lambda r: "save" in r.url.lower() and r.request.method == "POST", timeout=10000):
+                        await save_btn.click()
                     logging.info("  Saved.")
-            elif changes_made and DRY_RUN:
-                logging.info("  [Dry Run] Would have saved.")
+                except Exception:
+                    # Save didn't go through a request we recognise; let the page settle instead
+                    try:
+                        await page.wait_for_load_state("networkidle", timeout=5000)
+                    except Exception as e:
+                        logging.warning(f"  Save response not seen: {e}")
+        elif changes_made and dry_run:
+            logging.info("  [Dry Run] Would have saved.")
+    finally:
+        pages.put_nowait(page)
+
+async def reconcile_chunk(pages, cache, bulk, rows, offset, dry_run):
+    """Resolves and reconciles one chunk of CSV rows; offset is the index of its first row in the file."""
+    # Seed the cache from the local dump; only cards missing from it hit the API
+    for row in rows:
+        scry_id = row.get('Scryfall ID')
+        if scry_id and scry_id not in cache and scry_id in bulk:
+            cache[scry_id] = bulk[scry_id]
+
+    # Resolve all Magic cards up front in a handful of batched requests
+    scryfall_checked = prefetch_scryfall_ids(rows, cache)
+    # ...then fan out whatever is left concurrently, before any browser work
+    await resolve_api_ids(rows, cache, scryfall_checked)
+
+    # Pass 1: resolve every row to a Product ID (API lookups are cached by now),
+    # falling back to one admin search per distinct unresolved name
+    pids = [cached_product_id(row, cache) for row in rows]
+    found = await search_product_ids(pages, cache, [
+        row['Name'] for row, pid in zip(rows, pids)
+        if not pid and row.get('Name') and row['Name'] != "Unknown"
+    ])
+    pids = [pid or found.get(row.get('Name')) for row, pid in zip(rows, pids)]
+
+    # Group rows by product so each admin page is loaded and saved once
+    groups = {}
+    for i, (row, pid) in enumerate(zip(rows, pids), start=offset):
+        if pid:
+            groups.setdefault(pid, []).append((i, row))
+        else:
+            logging.warning(f"[{i+1}] SKIPPING {row.get('Name', 'Unknown')}: No Product ID found.")
+    logging.info(f"Rows {offset+1}-{offset+len(rows)} map to {len(groups)} products")
+
+    # Pass 2: one visit per product
+    results = await asyncio.gather(*[
+        reconcile_product(pages, pid, entries, dry_run)
+        for pid, entries in groups.items()
+    ], return_exceptions=True)
+    for pid, result in zip(groups, results):
+        if isinstance(result, Exception):
+            logging.error(f"Error reconciling product {pid}: {result}")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Reconcile TCGPlayer Inventory from Master CSV")
+    parser.add_argument("csv_file", help="Path to the Master CSV file")
+    parser.add_argument("--live", action="store_true", help="Actually update inventory (disable dry run)")
+    parser.add_argument("--scryfall-bulk", action="store_true", help="Resolve Magic cards from Scryfall's daily bulk dump (~150MB download, refreshed daily) instead of the API")
+    args = parser.parse_args()
+    
+    DRY_RUN = not args.live
+    
+    logging.info("Starting Inventory Reconciliation...")
+    if DRY_RUN:
+        logging.info("!!! DRY RUN MODE - No changes will be made !!!")
+    else:
+        logging.info("!!! LIVE MODE - INVENTORY WILL BE OVERWRITTEN !!!")
+
+    # Load Cache
+    cache = load_cache()
+
+    bulk = {}
+    if args.scryfall_bulk:
+        try:
+            bulk = bootstrap_scryfall_bulk()
+        except Exception as e:
+            logging.error(f"Scryfall bulk data unavailable, using the API: {e}")
+
+    # Open CSV (rows are streamed CSV_CHUNK_SIZE at a time, not loaded whole)
+    try:
+        f = open(args.csv_file, 'r', encoding='utf-8-sig')
+    except Exception as e:
+        logging.error(f"Could not read CSV: {e}")
+        return
+
+    with f:
+        reader = csv.DictReader(f)
+
+        async with async_playwright() as p:
+            try:
+                browser = await p.chromium.connect_over_cdp("http://127.0.0.1:9222")
+                context = browser.contexts[0]
+            except Exception as e:
+                logging.error(f"Error connecting to Chrome: {e}")
+                return
+
+            # Pool of warm tabs, reused across products; its size caps pages in flight
+            pages = asyncio.Queue()
+            for _ in range(MAX_PARALLEL):
+                page = await context.new_page()
+                page.set_default_timeout(15000)
+                await page.route("**/*", block_heavy_resources)
+                pages.put_nowait(page)
+            
+            offset = 0
+            try:
+                while rows := list(itertools.islice(reader, CSV_CHUNK_SIZE)):
+                    logging.info(f"Loaded rows {offset+1}-{offset+len(rows)} from {args.csv_file}")
+                    await reconcile_chunk(pages, cache, bulk, rows, offset, DRY_RUN)
+                    offset += len(rows)
+            finally:
+                # Runs on Ctrl-C too, so resolved IDs are never lost
+                save_cache(cache)
+                while not pages.empty():
+                    await pages.get_nowait().close()
 
-    logging.info("Reconciliation Complete.")
+    logging.info(f"Reconciliation Complete ({offset} rows).")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -2,14 +2,38 @@ import csv
 import time
 import logging
 import datetime
+import functools
+import itertools
 import requests
 import json
 import os
+import re
 import argparse
-from playwright.sync_api import sync_playwright
+import threading
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from http_utils import acquire_slot
+from page_utils import TABLE_BOUND_JS
+
+# orjson is much faster on a large ID cache; stdlib json works too
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 CSV_FILE = 'spm_for_store.csv'
 CACHE_FILE = 'tcg_id_cache.json'
+# Cached Scryfall -> TCGPlayer IDs older than this are refetched
+CACHE_TTL = 30 * 24 * 60 * 60
+# Max identifiers Scryfall accepts per /cards/collection request
+SCRYFALL_BATCH_SIZE = 75
+# Cards buffered and grouped by product at a time in the browser loop
+SORT_CHUNK_SIZE = 500
+# Parallel single-card lookups (acquire_slot caps the request rate)
+FETCH_WORKERS = 8
 # DRY_RUN is now handled via args
 LOG_FILE = f"upload_report_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
 
@@ -33,36 +57,170 @@ CONDITION_MAP = {
     'damaged': 'Damaged'
 }
 
+# One CSV row; tcg_id is filled in once the Scryfall ID is resolved
+Card = namedtuple("Card", "scryfall_id name condition foil qty tcg_id")
+# CSV columns backing each Card field (all but tcg_id)
+CARD_COLUMNS = ('Scryfall ID', 'Name', 'Condition', 'Foil', 'Quantity')
+
+# Manage-page row label for each (condition, is_foil), e.g. ("Near Mint", True) -> "Near Mint Foil"
+LABELS = {
+    (cond, foil): f"{cond} Foil" if foil else cond
+    for cond in CONDITION_MAP.values() for foil in (False, True)
+}
+# Dollar amount in a price cell: "$1,234.56" -> "1,234.56"
+PRICE_RE = re.compile(r'\$\s*([\d,]*\.?\d+)')
+
+# Requests the manage table doesn't need; aborted only on the upload tab that
+# process_product drives, so the tab the user logs in on loads normally
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_HOSTS = ("google-analytics", "googletagmanager", "doubleclick", "fonts.googleapis", "fonts.gstatic", "hotjar", "segment.io")
+
+# Every kind of "Match" price button a manage-page row can carry
+MATCH_BUTTON_SELECTOR = "button:has-text('Match'), input[value*='Match'], a.btn:has-text('Match')"
+
+# Maps the manage table's rows (via evaluate_all) in one round-trip. Columns: Condition,
+# Lowest Listing, Last Sold, Market Price, Marketplace Price, Qty -> market price is index 3.
+TABLE_ROWS_JS = """rows => rows.map(tr => {
+    const tds = tr.querySelectorAll("td");
+    const inputs = tr.querySelectorAll("input[type='text']");
+    return {
+        label: tds[0] ? tds[0].textContent.trim() : "",
+        price: tds[3] ? tds[3].textContent.trim() : "",
+        qty: inputs.length ? inputs[inputs.length - 1].value : ""
+    };
+})"""
+
+# Session for the Scryfall lookups, sized to FETCH_WORKERS
+SESSION = requests.Session()
+SESSION.headers["User-Agent"] = "tcg-uploader/1.0"
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=FETCH_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.25, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+cache_lock = threading.Lock()
+
+def block_heavy_resources(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+        route.abort()
+    else:
+        route.continue_()
+
 def load_cache():
     if os.path.exists(CACHE_FILE):
+        if orjson:
+            with open(CACHE_FILE, 'rb') as f:
+                return orjson.loads(f.read())
         with open(CACHE_FILE, 'r') as f:
             return json.load(f)
     return {}
 
 def save_cache(cache):
-    with open(CACHE_FILE, 'w') as f:
-        json.dump(cache, f)
+    # Write to a temp file and swap it in, so a crash mid-write can't corrupt the cache
+    tmp_path = CACHE_FILE + ".tmp"
+    if orjson:
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(cache))
+    else:
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+    os.replace(tmp_path, CACHE_FILE)
+
+def is_fresh(entry):
+    """
+    True for entries stored as {"tcg_id": ..., "ts": ...} less than CACHE_TTL ago.
+    Bare IDs (older runs, reconcile_inventory.py) have no timestamp and count as stale.
+    """
+    return isinstance(entry, dict) and time.time() - entry.get('ts', 0) < CACHE_TTL
+
+@functools.lru_cache(maxsize=100_000)
+def fetch_tcg_id(scryfall_id):
+    """
+    Looks up a card on Scryfall and returns (found, tcgplayer_id). Memoized,
+    misses included, so repeat IDs never re-hit the network within a run;
+    errors raise (and aren't cached).
+    """
+    url = f"https://api.scryfall.com/cards/{scryfall_id}"
+    acquire_slot() # Rate limit
+    response = SESSION.get(url, timeout=10)
+    if response.status_code != 200:
+        return False, None
+    return True, response.json().get('tcgplayer_id')
 
 def get_tcgplayer_id(scryfall_id, cache):
-    if scryfall_id in cache:
-        return cache[scryfall_id]
+    entry = cache.get(scryfall_id)
+    if is_fresh(entry):
+        return entry['tcg_id']
     
-    url = f"https://api.scryfall.com/cards/{scryfall_id}"
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            tcg_id = data.get('tcgplayer_id')
-            cache[scryfall_id] = tcg_id
-            time.sleep(0.1) # Rate limit
-            return tcg_id
+        found, tcg_id = fetch_tcg_id(scryfall_id)
+        if found:
+            with cache_lock:
+                cache[scryfall_id] = {"tcg_id": tcg_id, "ts": time.time()}
+        return tcg_id
     except Exception as e:
         logging.error(f"Scryfall API error for {scryfall_id}: {e}")
     return None
 
+def read_cards(path):
+    """Yields a Card per CSV row, reading the needed columns by header position."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        cols = [header.index(name) for name in CARD_COLUMNS]
+        for row in reader:
+            if len(row) < len(header):
+                row += [''] * (len(header) - len(row))
+            yield Card(*(row[i] for i in cols), None)
+
+def iter_cards(cache):
+    """Streams the CSV, yielding each card with its tcg_id filled in and skipping those without one."""
+    for card in read_cards(CSV_FILE):
+        if not card.scryfall_id:
+            continue
+        tid = get_tcgplayer_id(card.scryfall_id, cache)
+        if tid:
+            yield card._replace(tcg_id=tid)
+        else:
+            logging.warning(f"Could not find TCGPlayer ID for {card.name}")
+
+def prefetch_tcgplayer_ids(scryfall_ids, cache):
+    """
+    Resolves every uncached Scryfall ID via /cards/collection,
+    SCRYFALL_BATCH_SIZE at a time. IDs Scryfall reports as not_found are
+    cached with no tcg_id, so they aren't retried until CACHE_TTL; IDs in a
+    batch that failed are left uncached for get_tcgplayer_id to look up one by one.
+    """
+    missing = list(dict.fromkeys(sid for sid in scryfall_ids if sid and not is_fresh(cache.get(sid))))
+    if not missing:
+        return
+    
+    print(f"Fetching IDs for {len(missing)} uncached cards in batches of {SCRYFALL_BATCH_SIZE}...")
+    for start in range(0, len(missing), SCRYFALL_BATCH_SIZE):
+        chunk = missing[start:start + SCRYFALL_BATCH_SIZE]
+        try:
+            acquire_slot() # Rate limit
+            response = SESSION.post(
+                "https://api.scryfall.com/cards/collection",
+                json={"identifiers": [{"id": sid} for sid in chunk]},
+                timeout=30
+            )
+            response.raise_for_status()
+            now = time.time()
+            result = response.json()
+            for card in result.get('data', []):
+                cache[card['id']] = {"tcg_id": card.get('tcgplayer_id'), "ts": now}
+            for identifier in result.get('not_found', []):
+                cache[identifier['id']] = {"tcg_id": None, "ts": now}
+        except Exception as e:
+            logging.error(f"Scryfall collection API error: {e}")
+
 def main():
     parser = argparse.ArgumentParser(description="Upload Cards to TCGPlayer")
     parser.add_argument("--live", action="store_true", help="Actually upload cards (disable dry run)")
+    parser.add_argument("--fetch-only", action="store_true", help="Resolve and cache TCGPlayer IDs, then exit without opening the browser")
     args = parser.parse_args()
     
     global DRY_RUN
@@ -75,39 +233,43 @@ def main():
         logging.info("!!! LIVE MODE - INVENTORY WILL BE UPDATED !!!")
     
     print("IMPORTANT: Ensure you have launched Chrome with: --remote-debugging-port=9222")
+    print("  Recommended for speed: --disable-background-timer-throttling --disable-renderer-backgrounding "
+          "--disable-backgrounding-occluded-windows --disable-features=CalculateNativeWinOcclusion")
     
     # 1. Load CSV and Fetch IDs
     logging.info("Loading CSV and fetching TCGPlayer IDs...")
     cache = load_cache()
-    cards_to_process = []
     
-    with open(CSV_FILE, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        raw_cards = list(reader)
-        
-    print(f"Fetching IDs for {len(raw_cards)} cards (this may take a moment)...")
-    for i, card in enumerate(raw_cards):
-        sid = card['Scryfall ID']
-        if sid:
-            tid = get_tcgplayer_id(sid, cache)
-            if tid:
-                card['tcg_id'] = tid
-                cards_to_process.append(card)
-            else:
-                logging.warning(f"Could not find TCGPlayer ID for {card['Name']}")
+    # Stream the CSV once just for its Scryfall IDs (with per-ID row counts);
+    # full rows are re-read one at a time by iter_cards() later
+    sid_counts = Counter(card.scryfall_id for card in read_cards(CSV_FILE) if card.scryfall_id)
         
-        if i % 10 == 0:
-            print(f"  Processed {i}/{len(raw_cards)}...")
+    # Resolve everything uncached in a handful of batched requests; the
+    # per-card lookup below is then only a fallback for failed batches
+    prefetch_tcgplayer_ids(sid_counts, cache)
+    
+    # Anything a failed batch left behind is looked up one by one, in parallel
+    leftover = [sid for sid in sid_counts if not is_fresh(cache.get(sid))]
+    if leftover:
+        print(f"Fetching {len(leftover)} remaining IDs individually...")
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            list(pool.map(lambda sid: get_tcgplayer_id(sid, cache), leftover))
             
     save_cache(cache)
-    logging.info(f"Ready to process {len(cards_to_process)} cards.")
+    total = sum(n for sid, n in sid_counts.items() if is_fresh(cache.get(sid)) and cache[sid]['tcg_id'])
+    logging.info(f"Ready to process {total} cards.")
+    
+    if args.fetch_only:
+        return
     
     # 2. Browser Automation
+    # Imported here so --fetch-only runs never pay Playwright's import cost
+    from playwright.sync_api import sync_playwright
     with sync_playwright() as p:
         try:
             browser = p.chromium.connect_over_cdp("http://127.0.0.1:9222")
             context = browser.contexts[0]
-            page = context.pages[0] if context.pages else context.new_page()
+            context.set_default_navigation_timeout(8000)
             logging.info("Connected to Chrome.")
         except Exception as e:
             logging.error(f"Could not connect to Chrome: {e}")
@@ -120,36 +282,44 @@ def main():
         print("="*50 + "\n")
         input()
         
-        for i, card in enumerate(cards_to_process):
-            try:
-                process_card(page, card, i + 1, len(cards_to_process))
-            except Exception as e:
-                logging.error(f"Error processing {card['Name']}: {e}")
+        # Work in a tab of our own so blocking only applies there: the manage
+        # table doesn't need card art, fonts or trackers, but the user's tabs do
+        page = context.new_page()
+        page.route("**/*", block_heavy_resources)
+        
+        # Sort each chunk so copies of one product (e.g. NM and LP) are adjacent
+        # and get applied in one visit; chunking keeps the stream's memory bound
+        cards = iter_cards(cache)
+        index = 1
+        while chunk := list(itertools.islice(cards, SORT_CHUNK_SIZE)):
+            chunk.sort(key=lambda c: (product_key(c), c.foil, c.condition))
+            for _, group in itertools.groupby(chunk, key=product_key):
+                group = list(group)
+                try:
+                    process_product(page, group, index, total)
+                except Exception as e:
+                    logging.error(f"Error processing {', '.join(card.name for card in group)}: {e}")
+                index += len(group)
+        page.close()
 
     logging.info("Done! Check log file.")
     input("Press Enter to close...")
 
-def process_card(page, card, index, total):
-    name = card['Name']
-    tcg_id = card['tcg_id']
-    condition_raw = card['Condition']
-    foil_raw = card['Foil']
-    qty = card['Quantity']
-    
-    condition = CONDITION_MAP.get(condition_raw, 'Near Mint')
-    is_foil = foil_raw.lower() == 'foil'
-    
-    logging.info(f"[{index}/{total}] Processing: {name} (ID: {tcg_id}) - {condition} {'Foil' if is_foil else ''}")
+def product_key(card):
+    """Groups a card with its product's other copies, whether its ID was cached as an int or a str."""
+    return str(card.tcg_id)
+
+def process_product(page, cards, index, total):
+    """
+    Adds every card in cards (all copies of one product) on a single visit to
+    its manage page: one load, one table read, one Save. index is the first
+    card's position in the run.
+    """
+    tcg_id = cards[0].tcg_id
     
     # Direct Navigation
     url = f"https://store.tcgplayer.com/admin/product/manage/{tcg_id}"
-    page.goto(url)
-    
-    # Wait for page load
-    try:
-        page.wait_for_selector("h2", timeout=5000) # Wait for header
-    except:
-        pass
+    page.goto(url, wait_until="commit")
 
     # The "Manage" page lists all printings/conditions.
     # We need to find the row that matches our Condition and Foil status.
@@ -181,155 +351,127 @@ def process_card(page, card, index, total):
     
     logging.info("  Arrived at Manage Page.")
     
-    # Wait for table
+    # Wait for the whole table to be parsed and bound: a row read before its
+    # qty input is filled would count from 0 and overwrite the store's stock
     try:
-        page.wait_for_selector("table.product-list", timeout=10000) # Guessing class, or just wait for 'tr'
-    except:
-        pass
+        page.wait_for_load_state("domcontentloaded")
+        page.wait_for_function(TABLE_BOUND_JS, timeout=8000)
+    except Exception as e:
+        logging.warning(f"  Manage table never finished loading, skipping: {e}")
+        return
 
-    # Get all rows
-    rows = page.locator("table tbody tr").all()
-    logging.info(f"  Found {len(rows)} rows.")
+    # Read every row's label, market price and qty in a single evaluate
+    rows = page.locator("table tbody tr")
+    data = rows.evaluate_all(TABLE_ROWS_JS)
+    logging.info(f"  Found {len(data)} rows.")
     
-    target_row_found = False
+    # Row index -> new qty, accumulated across this product's cards
+    new_qtys = {}
     
-    # Construct the exact text we are looking for in the first column
-    # Based on screenshot: "Near Mint", "Lightly Played", "Near Mint Foil", "Lightly Played Foil"
-    target_condition_text = condition
-    if is_foil:
-        target_condition_text += " Foil"
+    for offset, card in enumerate(cards):
+        name = card.name
+        condition = CONDITION_MAP.get(card.condition, 'Near Mint')
+        is_foil = card.foil.lower() == 'foil'
+        
+        logging.info(f"[{index + offset}/{total}] Processing: {name} (ID: {tcg_id}) - {condition} {'Foil' if is_foil else ''}")
         
-    logging.info(f"  Target Row Text: '{target_condition_text}'")
+        # Construct the exact text we are looking for in the first column
+        # Based on screenshot: "Near Mint", "Lightly Played", "Near Mint Foil", "Lightly Played Foil"
+        target_condition_text = LABELS[(condition, is_foil)]
+            
+        logging.info(f"  Target Row Text: '{target_condition_text}'")
 
-    # Data collection for Anomaly Check
-    prices = {} # { 'Near Mint': 10.0, 'Lightly Played': 12.0, ... }
-    rows_map = {} # { 'Near Mint': row_object, ... }
+        # Data collection for Anomaly Check (only ever used when listing as Near Mint)
+        prices = {} # { 'Near Mint': 10.0, 'Lightly Played': 12.0, ... }
 
-    for row in rows:
-        try:
-            row_text = row.locator("td").first.text_content().strip()
-            
-            # Store row for later access
-            # Normalize text to just the condition part for easier mapping if needed
-            # But for now, we use the full text as key (e.g. "Near Mint Foil")
-            rows_map[row_text] = row
-            
-            # Extract Market Price
-            # Assuming Market Price is in the 4th column (index 3) or similar
-            # We can look for the cell with "TCG Market Price" header alignment, 
-            # or just grab the text from the cell that looks like a price
-            
-            # Based on screenshot, Market Price is a column. Let's try to find it.
-            # It's usually the column before the "Match" button for Market Price.
-            # Or we can just grab all text in the row and regex for prices?
-            # Let's try getting the cell by index. 
-            # Columns: Condition, Lowest Listing, Last Sold, Market Price, Marketplace Price, Qty
-            # Index: 0, 1, 2, 3, 4, 5
-            
-            market_price_cell = row.locator("td").nth(3) 
-            price_text = market_price_cell.text_content().strip()
-            # Clean price: "$0.04" -> 0.04
-            price_val = 0.0
-            if '$' in price_text:
-                try:
-                    price_val = float(price_text.replace('$', '').replace(',', ''))
-                except:
-                    pass
-            prices[row_text] = price_val
-            
-        except:
-            continue
+        if condition == "Near Mint":
+            for row_data in data:
+                # Full label is the key (e.g. "Near Mint Foil")
+                # Clean price: "$0.04" -> 0.04
+                m = PRICE_RE.search(row_data['price'])
+                prices[row_data['label']] = float(m.group(1).replace(',', '')) if m else 0.0
 
-    # --- Anomaly Check ---
-    # Only relevant if we are listing as "Near Mint"
-    # We want to check if "Lightly Played" (of same foil status) is higher.
-    
-    check_foil_suffix = " Foil" if is_foil else ""
-    nm_key = f"Near Mint{check_foil_suffix}"
-    lp_key = f"Lightly Played{check_foil_suffix}"
-    
-    if condition == "Near Mint" and nm_key in prices and lp_key in prices:
-        nm_price = prices[nm_key]
-        lp_price = prices[lp_key]
+        # --- Anomaly Check ---
+        # Only relevant if we are listing as "Near Mint"
+        # We want to check if "Lightly Played" (of same foil status) is higher.
+        
+        nm_key = LABELS[("Near Mint", is_foil)]
+        lp_key = LABELS[("Lightly Played", is_foil)]
         
-        if lp_price > nm_price:
-            logging.warning(f"  [ANOMALY] LP (${lp_price}) is higher than NM (${nm_price})!")
-            print(f"\n  !!! PRICING ANOMALY DETECTED !!!")
-            print(f"  Card: {name}")
-            print(f"  Near Mint:      ${nm_price}")
-            print(f"  Lightly Played: ${lp_price}")
-            print(f"  You are currently listing as: {condition}")
+        if condition == "Near Mint" and nm_key in prices and lp_key in prices:
+            nm_price = prices[nm_key]
+            lp_price = prices[lp_key]
             
-            if not DRY_RUN:
-                choice = input("  >>> Switch listing to 'Lightly Played' to capture higher price? (y/n): ")
-                if choice.lower() == 'y':
-                    logging.info("  User chose to downgrade to LP for higher price.")
-                    target_condition_text = lp_key # Switch target
-                    # Update condition variable for logging consistency if needed
-                    condition = "Lightly Played" 
+            if lp_price > nm_price:
+                logging.warning(f"  [ANOMALY] LP (${lp_price}) is higher than NM (${nm_price})!")
+                print(f"\n  !!! PRICING ANOMALY DETECTED !!!")
+                print(f"  Card: {name}")
+                print(f"  Near Mint:      ${nm_price}")
+                print(f"  Lightly Played: ${lp_price}")
+                print(f"  You are currently listing as: {condition}")
+                
+                if not DRY_RUN:
+                    choice = input("  >>> Switch listing to 'Lightly Played' to capture higher price? (y/n): ")
+                    if choice.lower() == 'y':
+                        logging.info("  User chose to downgrade to LP for higher price.")
+                        target_condition_text = lp_key # Switch target
+                        # Update condition variable for logging consistency if needed
+                        condition = "Lightly Played" 
 
-    # --- End Anomaly Check ---
+        # --- End Anomaly Check ---
 
-    for row in rows:
-        try:
-            row_text = row.locator("td").first.text_content().strip()
-        except:
+        target_idx = next((i for i, row_data in enumerate(data) if row_data['label'] == target_condition_text), None)
+        if target_idx is None:
+            logging.warning(f"  Could not find row for '{target_condition_text}'")
             continue
-            
-        # 1. Check if this is our TARGET row (potentially updated by anomaly check)
-        is_target = (row_text == target_condition_text)
         
-        # 2. Check if we should update price (if we have stock OR if it's our target)
-        qty_input = row.locator("input[type='text']").last
+        # Earlier copies of this product may already have added to the same row
+        current_qty_str = data[target_idx]['qty']
+        current_qty = new_qtys.get(target_idx, int(current_qty_str) if current_qty_str.isdigit() else 0)
+        new_qty = current_qty + int(card.qty)
+        new_qtys[target_idx] = new_qty
         
-        try:
-            current_qty_str = qty_input.input_value()
-            current_qty = int(current_qty_str) if current_qty_str.isdigit() else 0
-        except:
-            current_qty = 0
-            
-        if current_qty > 0 or is_target:
-            # Find the "Match" button for Market Price.
-            # Use robust selector from inventory_sync.py
-            match_buttons = row.locator("button, input[type='button'], a.btn").filter(has_text="Match").all()
-            
-            if not match_buttons:
-                 match_buttons = row.locator("text=Match").all()
-            
-            if len(match_buttons) >= 1:
-                if len(match_buttons) >= 3:
-                    market_match_btn = match_buttons[2]
-                else:
-                    market_match_btn = match_buttons[-1]
-                
-                if not DRY_RUN:
-                    market_match_btn.click()
-            else:
-                pass
+        logging.info(f"  [UPDATE] {target_condition_text}: Qty {current_qty} -> {new_qty}")
 
-        # 3. Update Quantity for TARGET row
-        if is_target:
-            target_row_found = True
-            new_qty = current_qty + int(qty)
-            
-            logging.info(f"  [UPDATE] {row_text}: Qty {current_qty} -> {new_qty}")
+    if not new_qtys:
+        return
+
+    # Only rows we hold stock in (reprice) and the target rows (restock) are
+    # touched, so locators are built for those indices alone
+    active_idx = {i for i, row_data in enumerate(data) if row_data['qty'].isdigit() and int(row_data['qty']) > 0}
+    active_idx.update(new_qtys)
+    
+    for i in sorted(active_idx):
+        row = rows.nth(i)
+        
+        # 1. Update price (we have stock OR it's a target)
+        # Find the "Match" button for Market Price (one selector, one round-trip)
+        match_buttons = row.locator(MATCH_BUTTON_SELECTOR).all()
+        
+        if len(match_buttons) >= 1:
+            if len(match_buttons) >= 3:
+                market_match_btn = match_buttons[2]
+            else:
+                market_match_btn = match_buttons[-1]
             
             if not DRY_RUN:
-                qty_input.fill(str(new_qty))
-                
-    if not target_row_found:
-        logging.warning(f"  Could not find row for '{target_condition_text}'")
-        return
+                market_match_btn.click()
+
+        # 2. Update Quantity for TARGET rows
+        if i in new_qtys and not DRY_RUN:
+            row.locator("input[type='text']").last.fill(str(new_qtys[i]))
 
-    # 4. Save
+    # 3. Save (once for all of this product's cards)
     if not DRY_RUN:
         # Find the Save button at the top or bottom
         save_btn = page.get_by_role("button", name="Save", exact=True).first
         if save_btn.is_visible():
-            save_btn.click()
-            logging.info("  Clicked Save.")
-            # Wait for save to complete (spinner or page reload)
-            time.sleep(2.5) 
+            try:
+                with page.expect_response(lambda r: "admin/product/manage" in r.url and r.request.method == "POST", timeout=10000):
+                    save_btn.click()
+                logging.info("  Clicked Save.")
+            except Exception as e:
+                logging.warning(f"  Save response not seen: {e}")
         else:
             logging.error("  Could not find Save button!")
     else: